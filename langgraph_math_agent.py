@@ -8,16 +8,28 @@ Author: Analytics Vidhya Assignment
 Model: meta-llama/llama-4-scout-17b-16e-instruct (Groq)
 """
 
+import asyncio
+import functools
+import operator
 import os
+import re
 from typing import Annotated, Literal
 from typing_extensions import TypedDict
 
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import (
+    HumanMessage,
+    AIMessage,
+    SystemMessage,
+    ToolMessage,
+    RemoveMessage,
+)
 from langchain_core.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_groq import ChatGroq
 
 from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
+from langgraph.graph.message import add_messages, REMOVE_ALL_MESSAGES
+from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import ToolNode
 
 # Load environment variables
@@ -29,67 +41,85 @@ load_dotenv()
 # STEP 1: Define Custom Mathematical Functions
 # ============================================================================
 
+@functools.lru_cache(maxsize=256)
+def _parse(s: str) -> float:
+    """Parse a numeric string, caching results.
+
+    Used for the arithmetic fast path's regex captures; queries often
+    repeat the same literals, so a small cache avoids re-parsing them.
+    """
+    return float(s)
+
+
+# Shared operator dispatch table backing all four tools (and the
+# arithmetic fast path)
+_OPS = {
+    "plus": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": operator.truediv,
+}
+
+
 @tool
-def plus(a: str, b: str) -> float:
+def plus(a: float, b: float) -> float:
     """Add two numbers together.
-    
+
     Args:
-        a: First number (as string)
-        b: Second number (as string)
-    
+        a: First number
+        b: Second number
+
     Returns:
         The sum of a and b
     """
-    return float(a) + float(b)
+    return _OPS["plus"](a, b)
 
 
 @tool
-def subtract(a: str, b: str) -> float:
+def subtract(a: float, b: float) -> float:
     """Subtract second number from first number.
-    
+
     Args:
-        a: First number (as string)
-        b: Second number (as string)
-    
+        a: First number
+        b: Second number
+
     Returns:
         The difference (a - b)
     """
-    return float(a) - float(b)
+    return _OPS["subtract"](a, b)
 
 
 @tool
-def multiply(a: str, b: str) -> float:
+def multiply(a: float, b: float) -> float:
     """Multiply two numbers together.
-    
+
     Args:
-        a: First number (as string)
-        b: Second number (as string)
-    
+        a: First number
+        b: Second number
+
     Returns:
         The product of a and b
     """
-    return float(a) * float(b)
+    return _OPS["multiply"](a, b)
 
 
 @tool
-def divide(a: str, b: str) -> float:
+def divide(a: float, b: float) -> float:
     """Divide first number by second number.
-    
+
     Args:
-        a: First number (numerator, as string)
-        b: Second number (denominator, as string)
-    
+        a: First number (numerator)
+        b: Second number (denominator)
+
     Returns:
         The quotient (a / b)
-    
+
     Raises:
         ValueError: If b is zero
     """
-    num_a = float(a)
-    num_b = float(b)
-    if num_b == 0:
+    if b == 0:
         raise ValueError("Cannot divide by zero!")
-    return num_a / num_b
+    return _OPS["divide"](a, b)
 
 
 # ============================================================================
@@ -119,14 +149,96 @@ llm = ChatGroq(
     groq_api_key=os.getenv("GROQ_API_KEY")
 )
 
+# Serialize the tool schemas to their OpenAI wire format once at import.
+# Binding the pre-converted dicts (bind_tools passes dicts through as-is)
+# keeps any Pydantic -> JSON schema conversion off the per-request path.
+_TOOL_SCHEMAS = [convert_to_openai_tool(t) for t in tools]
+
 # Bind tools to the LLM so it can call them
-llm_with_tools = llm.bind_tools(tools)
+llm_with_tools = llm.bind_tools(_TOOL_SCHEMAS)
 
 
 # ============================================================================
 # STEP 4: Define Graph Nodes
 # ============================================================================
 
+# Fixed system prompt sent as the first message of every request. Keeping it
+# a byte-identical constant (no per-turn interpolation!) gives Groq's
+# automatic prompt cache a stable prefix covering the system prompt and the
+# tool schemas, so those tokens are served from cache on subsequent turns.
+SYSTEM_PROMPT = (
+    "You are a helpful assistant. For mathematical calculations, use the "
+    "provided tools (plus, subtract, multiply, divide) instead of computing "
+    "answers yourself. For general knowledge questions, answer directly "
+    "and concisely."
+)
+
+
+# Number of recent conversation turns kept verbatim in history; anything
+# older is collapsed into a single rolling summary message
+HISTORY_WINDOW_TURNS = 6
+
+
+def trim_history(state: AgentState) -> AgentState:
+    """Bound conversation history with a sliding window plus rolling summary.
+
+    This node runs before the chatbot. Once the history exceeds roughly
+    2 * HISTORY_WINDOW_TURNS turns, everything but the last
+    HISTORY_WINDOW_TURNS turns is summarized with a single LLM call and
+    replaced by one summary message, so the tokens sent to Groq per turn
+    stay roughly constant instead of growing with session length. Trimming
+    down to half the trigger threshold leaves K turns of headroom, so the
+    summarization call amortizes to once per K turns rather than firing
+    on every turn once the session is long.
+
+    Args:
+        state: Current agent state containing messages
+
+    Returns:
+        State update that removes old messages and keeps
+        [summary, last K turns], or a no-op update if under budget
+    """
+    messages = state["messages"]
+
+    # Under budget: nothing to trim (a turn is roughly a Human/AI pair)
+    if len(messages) <= 4 * HISTORY_WINDOW_TURNS:
+        return {"messages": []}
+
+    # Cut on a HumanMessage boundary so a tool-calling AIMessage is never
+    # separated from its ToolMessage replies (Groq rejects histories with
+    # orphaned tool messages). If no turn starts inside the window, skip
+    # trimming rather than produce a broken split.
+    cut = len(messages) - 2 * HISTORY_WINDOW_TURNS
+    while cut < len(messages) and not isinstance(messages[cut], HumanMessage):
+        cut += 1
+    if cut == 0 or cut == len(messages):
+        return {"messages": []}
+
+    old_messages = messages[:cut]
+    recent_messages = messages[cut:]
+
+    # One LLM call to fold the old messages into a short summary
+    summary = llm.invoke(
+        [SystemMessage(content="Summarize the following conversation briefly:")]
+        + old_messages
+    )
+    summary_message = AIMessage(
+        content=f"Summary of earlier conversation: {summary.content}"
+    )
+
+    # Rebuild history as [summary, *recent]: REMOVE_ALL_MESSAGES clears the
+    # existing list outright, then the summary and kept tail are added in
+    # the order given (per-id removals would collapse into in-place
+    # replacements and leave the summary appended at the end instead)
+    return {
+        "messages": [
+            RemoveMessage(id=REMOVE_ALL_MESSAGES),
+            summary_message,
+        ]
+        + recent_messages
+    }
+
+
 def chatbot(state: AgentState) -> AgentState:
     """Chatbot node that uses LLM to reason and decide on tool usage.
     
@@ -142,7 +254,14 @@ def chatbot(state: AgentState) -> AgentState:
     Returns:
         Updated state with LLM response added to messages
     """
-    response = llm_with_tools.invoke(state["messages"])
+    messages = state["messages"]
+
+    # Prepend the constant system prompt so every request starts with the
+    # same prefix and Groq's prompt cache can hit on it
+    if not messages or not isinstance(messages[0], SystemMessage):
+        messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
+
+    response = llm_with_tools.invoke(messages)
     return {"messages": [response]}
 
 
@@ -168,27 +287,27 @@ def should_continue(state: AgentState) -> Literal["tools", "end"]:
     Returns:
         "tools" if tool calls are present, "end" otherwise
     """
-    messages = state["messages"]
-    last_message = messages[-1]
-    
-    # Check if the last message has tool calls
-    if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-        return "tools"
-    return "end"
+    last_message = state["messages"][-1]
+
+    # getattr with a default avoids hasattr's try/except path; this runs
+    # on every graph step
+    tool_calls = getattr(last_message, "tool_calls", None)
+    return "tools" if tool_calls else "end"
 
 
 # ============================================================================
 # STEP 6: Build the Graph
 # ============================================================================
 
-def create_graph():
+def _build_graph():
     """Create and compile the LangGraph agent.
     
     Graph structure:
-        START -> chatbot -> [tools -> chatbot] or END
+        START -> trim_history -> chatbot -> [tools -> chatbot] or END
     
     Flow:
-    1. User input goes to chatbot node
+    1. User input goes through trim_history (bounds the prompt size),
+       then to the chatbot node
     2. Chatbot (LLM) decides if tools are needed
     3. If tools needed: execute tools, return to chatbot for final answer
     4. If no tools needed: directly end with LLM's answer
@@ -200,11 +319,13 @@ def create_graph():
     workflow = StateGraph(AgentState)
     
     # Add nodes to the graph
+    workflow.add_node("trim_history", trim_history)
     workflow.add_node("chatbot", chatbot)
     workflow.add_node("tools", tool_node)
-    
+
     # Add edges
-    workflow.add_edge(START, "chatbot")  # Start goes to chatbot
+    workflow.add_edge(START, "trim_history")  # Trim history before the LLM
+    workflow.add_edge("trim_history", "chatbot")
     
     # Conditional edge: chatbot decides next step
     workflow.add_conditional_edges(
@@ -219,19 +340,34 @@ def create_graph():
     # After tools execute, return to chatbot for final answer
     workflow.add_edge("tools", "chatbot")
     
-    # Compile the graph
-    graph = workflow.compile()
-    
+    # Compile the graph with an in-memory checkpointer: conversation
+    # history lives in the graph, keyed by thread_id, so callers send an
+    # O(1) delta per turn instead of replaying the whole history
+    graph = workflow.compile(checkpointer=MemorySaver())
+
     return graph
 
 
-def save_graph_visualization(graph, output_path="./graph_architecture"):
-    """Save the LangGraph visualization as both PNG (if possible) and Mermaid text.
-    
+# The compiled graph can be shared: its MemorySaver keys every
+# conversation by thread_id, so concurrent callers don't collide. Cache
+# it so repeat callers skip the StateGraph build and compile step.
+create_graph = functools.lru_cache(maxsize=1)(_build_graph)
+
+
+def save_graph_visualization(graph, output_path="./graph_architecture",
+                             generate_png=False):
+    """Save the LangGraph visualization as Mermaid text (and optionally PNG).
+
+    PNG rendering is opt-in because draw_mermaid_png() calls out to
+    mermaid.ink over the network, which blocks startup for hundreds of
+    milliseconds. The .mmd file can always be viewed at
+    https://mermaid.live/edit instead.
+
     Args:
         graph: Compiled LangGraph agent
         output_path: Path where to save the visualization (without extension)
-    
+        generate_png: Also render a PNG (or set the LMA_RENDER_PNG env var)
+
     Returns:
         Tuple of (png_path or None, mermaid_path)
     """
@@ -249,18 +385,19 @@ def save_graph_visualization(graph, output_path="./graph_architecture"):
         print(f"⚠️  Could not generate Mermaid text: {str(e)}")
         return None, None
     
-    # Try to generate PNG (optional, requires additional dependencies)
-    try:
-        png_path = f"{output_path}.png"
-        png_data = graph.get_graph().draw_mermaid_png()
-        with open(png_path, "wb") as f:
-            f.write(png_data)
-        print(f"✓ Graph PNG image saved to: {png_path}")
-    except Exception as e:
-        print(f"ℹ️  PNG generation skipped (optional): {str(e)}")
-        print(f"   You can visualize the .mmd file at https://mermaid.live/edit")
-        png_path = None
-    
+    # PNG rendering is opt-in: it needs a network round-trip to mermaid.ink
+    if generate_png or os.getenv("LMA_RENDER_PNG"):
+        try:
+            png_path = f"{output_path}.png"
+            png_data = graph.get_graph().draw_mermaid_png()
+            with open(png_path, "wb") as f:
+                f.write(png_data)
+            print(f"✓ Graph PNG image saved to: {png_path}")
+        except Exception as e:
+            print(f"ℹ️  PNG generation skipped (optional): {str(e)}")
+            print(f"   You can visualize the .mmd file at https://mermaid.live/edit")
+            png_path = None
+
     return png_path, mermaid_path
 
 
@@ -268,33 +405,179 @@ def save_graph_visualization(graph, output_path="./graph_architecture"):
 # STEP 7: Demo and Testing
 # ============================================================================
 
-def run_agent(query: str, graph, conversation_state: dict = None):
+# Fast-path pattern for single-operation arithmetic queries
+# (e.g. "What is 25 plus 17?"). Compiled once at import so the hot path
+# only pays a single regex match before falling back to the LLM.
+_SIMPLE_MATH_PATTERN = re.compile(
+    r"^\s*(?:what\s+is\s+|calculate\s+|compute\s+)?"
+    r"(-?\d+(?:\.\d+)?)\s*"
+    r"(plus|minus|times|multiplied\s+by|divided\s+by|\+|-|\*|/)\s*"
+    r"(-?\d+(?:\.\d+)?)\s*\??\s*$",
+    re.IGNORECASE,
+)
+
+# Maps the matched operator word/symbol to the corresponding tool
+_FAST_PATH_TOOLS = {
+    "plus": plus,
+    "+": plus,
+    "minus": subtract,
+    "-": subtract,
+    "times": multiply,
+    "multiplied by": multiply,
+    "*": multiply,
+    "divided by": divide,
+    "/": divide,
+}
+
+
+def try_fast_math(query: str):
+    """Try to answer a simple arithmetic query without any LLM round-trip.
+
+    Detects single-operation arithmetic like "What is 25 plus 17?" and
+    calls the matching tool directly, skipping the chatbot -> tools ->
+    chatbot cycle (two network-bound LLM calls) entirely.
+
+    Args:
+        query: User's question or request
+
+    Returns:
+        The formatted answer string, or None if the query is not simple
+        arithmetic (caller should fall back to the full graph)
+    """
+    match = _SIMPLE_MATH_PATTERN.match(query)
+    if not match:
+        return None
+
+    a, op, b = match.groups()
+    op_tool = _FAST_PATH_TOOLS[" ".join(op.lower().split())]
+    try:
+        result = op_tool.invoke({"a": _parse(a), "b": _parse(b)})
+    except ValueError as e:
+        # e.g. division by zero: answer gracefully, matching how the full
+        # graph handles tool errors, instead of raising out of run_agent
+        return f"Sorry, I can't compute that: {e}"
+    return f"The answer is {result}."
+
+
+def _log_cached_tokens(message):
+    """Print Groq prompt-cache statistics for a response message, if present.
+
+    Groq reports how many prompt tokens were served from its automatic
+    prefix cache in the response metadata. Logging it verifies that the
+    constant system prompt + tool schemas are actually getting cache hits.
+
+    Args:
+        message: The final AIMessage returned by the graph
+    """
+    try:
+        token_usage = message.response_metadata["token_usage"]
+        cached = token_usage["prompt_tokens_details"]["cached_tokens"]
+        total = token_usage["prompt_tokens"]
+        print(f"  [prompt cache: {cached}/{total} tokens cached]")
+    except (AttributeError, KeyError, TypeError):
+        # Metadata shape varies by provider/version; stats are best-effort
+        pass
+
+
+def run_agent(query: str, graph, thread_id: str = "default"):
     """Run the agent with a user query while maintaining conversation history.
-    
+
+    History is kept by the graph's checkpointer, keyed by thread_id, so
+    each call passes only the new message as a delta; the add_messages
+    reducer merges it against the checkpointed state.
+
     Args:
         query: User's question or request
         graph: Compiled LangGraph agent
-        conversation_state: Current conversation state (maintains memory)
-    
+        thread_id: Conversation session identifier (selects the history)
+
     Returns:
-        Tuple of (response, updated_state)
+        The agent's response text
     """
-    # If this is the first query, create initial state
-    if conversation_state is None:
-        conversation_state = {"messages": []}
-    
-    # Add the new user message to the conversation
-    conversation_state["messages"].append(HumanMessage(content=query))
-    
-    # Run the graph with the full conversation history
-    result = graph.invoke(conversation_state)
-    
+    config = {"configurable": {"thread_id": thread_id}}
+
+    # Fast path: answer single-operation arithmetic with the tools directly,
+    # skipping both LLM round-trips of the chatbot -> tools -> chatbot cycle.
+    # Record the exchange on the thread so later turns still see it.
+    fast_response = try_fast_math(query)
+    if fast_response is not None:
+        graph.update_state(
+            config,
+            {
+                "messages": [
+                    HumanMessage(content=query),
+                    AIMessage(content=fast_response),
+                ]
+            },
+        )
+        return fast_response
+
+    # Run the graph with just the new message; the checkpointer supplies
+    # the rest of the history
+    result = graph.invoke({"messages": [HumanMessage(content=query)]}, config=config)
+
+    # Report prompt-cache hits so the stable-prefix optimization is visible
+    _log_cached_tokens(result["messages"][-1])
+
     # Extract the final response
-    final_message = result["messages"][-1]
-    response = final_message.content
-    
-    # Return both the response and the updated state
-    return response, result
+    return result["messages"][-1].content
+
+
+def run_agent_stream(query: str, graph, thread_id: str = "default"):
+    """Run the agent, printing response tokens to stdout as they arrive.
+
+    Same contract as run_agent, but uses graph.stream so the perceived
+    latency is time-to-first-token rather than full generation time.
+    Total compute is unchanged; only the waiting experience improves.
+
+    Args:
+        query: User's question or request
+        graph: Compiled LangGraph agent
+        thread_id: Conversation session identifier (selects the history)
+
+    Returns:
+        The agent's response text
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+
+    # Fast path: simple arithmetic is answered instantly, nothing to stream
+    fast_response = try_fast_math(query)
+    if fast_response is not None:
+        print(fast_response, end="", flush=True)
+        graph.update_state(
+            config,
+            {
+                "messages": [
+                    HumanMessage(content=query),
+                    AIMessage(content=fast_response),
+                ]
+            },
+        )
+        return fast_response
+
+    # Stream both LLM token chunks (printed as they arrive) and state
+    # snapshots (so the final response can be read back at the end)
+    final_state = None
+    for mode, payload in graph.stream(
+        {"messages": [HumanMessage(content=query)]},
+        config=config,
+        stream_mode=["messages", "values"],
+    ):
+        if mode == "messages":
+            chunk, metadata = payload
+            # Only echo chatbot tokens; tool output is fed back to the
+            # LLM rather than shown raw
+            if chunk.content and metadata.get("langgraph_node") == "chatbot":
+                print(chunk.content, end="", flush=True)
+        else:
+            final_state = payload
+
+    # Terminate the streamed line, then report prompt-cache hits so the
+    # stable-prefix optimization stays observable in interactive mode
+    print()
+    _log_cached_tokens(final_state["messages"][-1])
+
+    return final_state["messages"][-1].content
 
 
 def main():
@@ -320,8 +603,8 @@ def main():
     print("- Type '<QUIT>' to exit the conversation")
     print("="*70 + "\n")
     
-    # Initialize conversation state (maintains memory across queries)
-    conversation_state = None
+    # One checkpointer thread holds the whole interactive session
+    thread_id = "interactive"
     
     # Start interactive conversation loop
     while True:
@@ -341,12 +624,12 @@ def main():
                 print("⚠️  Please enter a question or type '<QUIT>' to exit.\n")
                 continue
             
-            # Run the agent with conversation memory
+            # Run the agent with conversation memory, streaming the
+            # response tokens as they arrive
             print("\n🤔 Processing...\n")
-            response, conversation_state = run_agent(user_input, graph, conversation_state)
-            
-            # Display the agent's response
-            print(f"Agent: {response}\n")
+            print("Agent: ", end="", flush=True)
+            run_agent_stream(user_input, graph, thread_id)
+            print("\n")
             print("-" * 70 + "\n")
             
         except KeyboardInterrupt:
@@ -361,6 +644,38 @@ def main():
             # Continue the loop even after errors
 
 
+async def _demo_async(graph, queries):
+    """Run independent demo queries concurrently.
+
+    Simple arithmetic queries are answered by the fast path without
+    touching Groq at all; the rest each get their own checkpointer
+    thread, so they can all be in flight against Groq at once.
+    Exceptions are returned in place of results so one failing query
+    doesn't abort the rest.
+
+    Args:
+        graph: Compiled LangGraph agent
+        queries: List of query strings
+
+    Returns:
+        List of response texts (or exceptions) in the same order as queries
+    """
+    async def run_one(query, thread_id):
+        fast_response = try_fast_math(query)
+        if fast_response is not None:
+            return fast_response
+        result = await graph.ainvoke(
+            {"messages": [HumanMessage(content=query)]},
+            config={"configurable": {"thread_id": thread_id}},
+        )
+        return result["messages"][-1].content
+
+    return await asyncio.gather(
+        *[run_one(query, f"demo-{i}") for i, query in enumerate(queries)],
+        return_exceptions=True,
+    )
+
+
 def demo_mode():
     """Demo function to demonstrate the agent with predefined queries."""
     
@@ -393,21 +708,21 @@ def demo_mode():
     print("Running Demo Queries...")
     print("="*70)
     
-    conversation_state = None
-    
-    for query in test_queries:
-        try:
-            print(f"\n{'='*70}")
-            print(f"Query: {query}")
-            print(f"{'='*70}")
-            
-            response, conversation_state = run_agent(query, graph, conversation_state)
-            
-            print(f"\nAgent Response: {response}")
+    # The demo queries are independent of each other, so fan them out
+    # concurrently: wall-clock time becomes roughly the slowest single
+    # query instead of the sum of all of them
+    results = asyncio.run(_demo_async(graph, test_queries))
+
+    for query, result in zip(test_queries, results):
+        print(f"\n{'='*70}")
+        print(f"Query: {query}")
+        print(f"{'='*70}")
+
+        if isinstance(result, Exception):
+            print(f"Error occurred: {str(result)}\n")
+        else:
+            print(f"\nAgent Response: {result}")
             print(f"{'='*70}\n")
-            
-        except Exception as e:
-            print(f"Error occurred: {str(e)}\n")
     
     print("\n" + "="*70)
     print("Demo completed!")